@@ -0,0 +1,91 @@
+'''
+File Purpose:
+    - Materialize team-level and cluster-level offensive profiles for each season so the web application can serve them without aggregating at request time
+
+Program Flow:
+    - Attach each unique ID's (player, team, season) cluster to its play-type stats
+    - For each team x season and cluster x season, sum possessions by play-type
+    - Frequency = play-type possessions / all possessions of the team (or cluster) in that season, i.e. player frequencies weighted by possessions
+    - PPP percentile = possession-weighted average of player percentiles for the play-type
+    - Output aggregated profiles
+
+Program Input:
+    - Credentials to auth in order to write to cloud storage: 'C:\\Users\\nrankin\\PycharmProjects\\Portfolio\\GCP\\clientcreds_storage_sa.json'
+    - 'AllSeasons_PlayTypeStats.csv' in nmrankin0_nbaappfiles bucket in GCS
+    - 'AllSeasons_ClusteredFreqs.csv' in nmrankin0_nbaappfiles bucket in GCS
+
+Program Output:
+    - 'AllSeasons_AggProfiles.csv' in nmrankin0_nbaappfiles bucket in GCS
+
+'''
+
+# ------------- IMPORT PACKAGES ------------- #
+import pandas as pd
+import numpy as np
+import os
+
+
+# ------------- TEAM & CLUSTER AGGREGATES ------------- #
+def aggregate_profiles(df, group_col, level):
+    """
+    Possession-weighted play-type frequency & PPP percentile for each group x season
+    """
+    df_agg = df.dropna(subset=[group_col, 'PlayType']).groupby([group_col, 'SEASON', 'PlayType'], as_index=False).agg(POSS=('POSS', 'sum'), PctPOSS=('PctPOSS', 'sum'), PctxPOSS=('PctxPOSS', 'sum'), Players=('UniqueID', 'nunique'))
+
+    df_agg['Freq%'] = df_agg['POSS'] / df_agg.groupby([group_col, 'SEASON'])['POSS'].transform('sum').replace(0, np.nan) * 100
+    df_agg['Percentile'] = df_agg['PctxPOSS'] / df_agg['PctPOSS'].replace(0, np.nan)
+
+    df_agg = df_agg.rename(columns={group_col: 'Group'})
+    df_agg.insert(0, 'Level', level)
+    return df_agg[['Level', 'Group', 'SEASON', 'PlayType', 'POSS', 'Players', 'Freq%', 'Percentile']]
+
+
+def build_agg_profiles(df, df_clus):
+    """
+    Build team x season & cluster x season profiles from play-type stats ('AllSeasons_PlayTypeStats.csv') & clusters ('AllSeasons_ClusteredFreqs.csv')
+    """
+    # Attach clusters to play-type stats
+    print('Attaching clusters to play-type stats', '\n')
+    df = df.copy()
+    df['UniqueID'] = df['PLAYER'] + ' - ' + df['TEAM'] + ' - ' + df['SEASON']
+    df = pd.merge(df, df_clus[['UniqueID', 'Cluster']], how='left', on='UniqueID')
+
+    # Possessions drive the weighting ; percentiles only carry weight where they exist
+    df['POSS'] = pd.to_numeric(df['POSS'], errors='coerce').fillna(0)
+    df['PctPOSS'] = df['POSS'].where(df['Percentile'].notna(), 0)
+    df['PctxPOSS'] = (df['Percentile'] * df['POSS']).fillna(0)
+
+    print('Aggregating team x season profiles', '\n')
+    df_team = aggregate_profiles(df, 'TEAM', 'Team')
+
+    print('Aggregating cluster x season profiles', '\n')
+    df['Cluster'] = df['Cluster'].astype('Int64')
+    df_cluster = aggregate_profiles(df, 'Cluster', 'Cluster')
+
+    df_aggprofiles = pd.concat([df_team, df_cluster], ignore_index=True)
+    df_aggprofiles['Freq%'] = df_aggprofiles['Freq%'].round(2)
+    df_aggprofiles['Percentile'] = df_aggprofiles['Percentile'].round(1)
+    return df_aggprofiles
+
+
+if __name__ == "__main__":
+    from google.cloud import storage
+
+    # Data to df ; local code: #df = pd.read_excel('AllSeasons_PlayTypeStats.xlsx')
+    print('Importing data', '\n')
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'C:\\Users\\nrankin\\PycharmProjects\\Portfolio\\GCP\\clientcreds_storage_sa.json'
+    bucket_name = 'nmrankin0_nbaappfiles'
+    df = pd.read_csv('gs://' + bucket_name + '/AllSeasons_PlayTypeStats.csv')
+    df_clus = pd.read_csv('gs://' + bucket_name + '/AllSeasons_ClusteredFreqs.csv')
+
+    df_aggprofiles = build_agg_profiles(df, df_clus)
+
+    # ---------------- OUTPUT AGGREGATED PROFILES ---------------- #
+    print('Outputting aggregated profiles', '\n')
+
+    # Output to GCS ; local code : # df_aggprofiles.to_excel('AllSeasons_AggProfiles.xlsx', index=False)
+    storage_client = storage.Client()
+    bucket = storage_client.get_bucket(bucket_name)
+    bucket.blob('AllSeasons_AggProfiles.csv').upload_from_string(df_aggprofiles.to_csv(index=False), 'text/csv')
+
+    print('Output complete', '\n')
@@ -0,0 +1,115 @@
+'''
+File Purpose:
+    - Build a player-keyed trajectory index so the web application can serve a player's full history (every team & season) in a single lookup
+
+Program Flow:
+    - Pivot play-type frequencies and PPP percentiles so each unique ID (player, team, season) is a single row
+    - Attach each unique ID's cluster
+    - Order stints by player, then season, so each player's stints form one contiguous block (stints within a season have no known chronological order)
+    - For each stint, compute the change in play-type frequencies since the player's previous season and the cluster they had in that season
+    - Store block offsets per player along with the stint arrays
+    - Output trajectory index
+
+Program Input:
+    - Credentials to auth in order to write to cloud storage: 'C:\\Users\\nrankin\\PycharmProjects\\Portfolio\\GCP\\clientcreds_storage_sa.json'
+    - 'AllSeasons_PlayTypeStats.csv' in nmrankin0_nbaappfiles bucket in GCS
+    - 'AllSeasons_ClusteredFreqs.csv' in nmrankin0_nbaappfiles bucket in GCS
+
+Program Output:
+    - 'AllSeasons_PlayerTrajectories.npz' in nmrankin0_nbaappfiles bucket in GCS
+        - players / offsets: player i's stints are rows offsets[i] to offsets[i+1]
+        - unique_ids, teams, seasons, same_season, clusters, prev_clusters: one value per stint (same_season = player has other stints that season ; cluster -1 = none)
+        - freqs, percentiles, freq_deltas: one row per stint, one column per play-type in playtypes
+
+'''
+
+# ------------- IMPORT PACKAGES ------------- #
+import pandas as pd
+import numpy as np
+import io
+import os
+
+playtype_words_list = ['Transition', 'Isolation', 'Pick & Roll Ball Handler',
+                       'Pick & Roll Roll Man', 'Post Up', 'Spot Up', 'Handoff', 'Cut',
+                        'Off Screen', 'Putbacks', 'Misc']
+
+
+# ------------- PLAYER TRAJECTORY INDEX ------------- #
+def build_player_trajectories(df, df_clus):
+    """
+    Build the trajectory index arrays from play-type stats ('AllSeasons_PlayTypeStats.csv') & clusters ('AllSeasons_ClusteredFreqs.csv')
+    """
+    # One row per stint
+    print('Pivoting play-type stats by unique ID', '\n')
+    df = df.copy()
+    df['UniqueID'] = df['PLAYER'] + ' - ' + df['TEAM'] + ' - ' + df['SEASON']
+    df['POSS'] = pd.to_numeric(df['POSS'], errors='coerce').fillna(0)
+
+    # The scraped play-type tables don't record when within a season a traded player's stints happened (their row order follows
+    # whichever play-type table was scraped first), so same-season stints are only sorted by team for a stable order
+    df_stints = df.groupby('UniqueID', as_index=False).agg(PLAYER=('PLAYER', 'first'), TEAM=('TEAM', 'first'), SEASON=('SEASON', 'first'), POSS=('POSS', 'sum'))
+    df_stints = pd.merge(df_stints, df_clus[['UniqueID', 'Cluster']].drop_duplicates('UniqueID'), how='left', on='UniqueID')
+    df_stints = df_stints.sort_values(['PLAYER', 'SEASON', 'TEAM']).reset_index(drop=True)
+    df_stints['Cluster'] = pd.to_numeric(df_stints['Cluster'], errors='coerce')
+    same_season = (df_stints.groupby(['PLAYER', 'SEASON'])['UniqueID'].transform('size') > 1).to_numpy()
+
+    # Frequencies default to 0 when a player has no entry for a play-type ; percentiles stay missing
+    freqs = df.pivot_table(index='UniqueID', columns='PlayType', values='Freq%', aggfunc='first').reindex(index=df_stints['UniqueID'], columns=playtype_words_list).fillna(0).to_numpy(dtype=np.float32)
+    percentiles = df.pivot_table(index='UniqueID', columns='PlayType', values='Percentile', aggfunc='first').reindex(index=df_stints['UniqueID'], columns=playtype_words_list).to_numpy(dtype=np.float32)
+
+    # Per-player blocks, deltas & cluster transitions
+    print('Building per-player blocks, deltas & cluster transitions', '\n')
+
+    # Block offsets: player i's stints are rows offsets[i]:offsets[i+1]
+    players, starts = np.unique(df_stints['PLAYER'].to_numpy(dtype=str), return_index=True)
+    offsets = np.append(starts, len(df_stints)).astype(np.int64)
+
+    # Player's season profile: possession-weighted average of the season's stints (plain average if no possessions), cluster of the biggest stint
+    df_weighted = pd.DataFrame(freqs * df_stints[['POSS']].to_numpy(), columns=playtype_words_list)
+    df_weighted[['PLAYER', 'SEASON', 'POSS']] = df_stints[['PLAYER', 'SEASON', 'POSS']]
+    df_season = df_weighted.groupby(['PLAYER', 'SEASON']).sum()
+    df_season_freqs = df_season[playtype_words_list].div(df_season['POSS'].replace(0, np.nan), axis=0)
+    df_season_freqs = df_season_freqs.fillna(pd.DataFrame(freqs, columns=playtype_words_list).assign(PLAYER=df_stints['PLAYER'], SEASON=df_stints['SEASON']).groupby(['PLAYER', 'SEASON']).mean())
+    season_clusters = df_stints.loc[df_stints.groupby(['PLAYER', 'SEASON'])['POSS'].idxmax()].set_index(['PLAYER', 'SEASON'])['Cluster']
+
+    # Changes are measured against the player's previous season, never between stints of the same season
+    df_prev = df_season_freqs.index.to_frame(index=False)
+    df_prev['PrevSEASON'] = df_prev.groupby('PLAYER')['SEASON'].shift()
+    prev_index = pd.MultiIndex.from_frame(pd.merge(df_stints[['PLAYER', 'SEASON']], df_prev, how='left', on=['PLAYER', 'SEASON'])[['PLAYER', 'PrevSEASON']])
+
+    # Change since the player's previous season (missing for a player's first season)
+    freq_deltas = (freqs - df_season_freqs.reindex(prev_index).to_numpy()).astype(np.float32)
+
+    # Cluster transitions: player's cluster in the previous season (-1 for a player's first season or no cluster)
+    clusters = df_stints['Cluster'].fillna(-1).to_numpy(dtype=np.int64)
+    prev_clusters = season_clusters.reindex(prev_index).fillna(-1).to_numpy(dtype=np.int64)
+
+    return {'playtypes': np.array(playtype_words_list), 'players': players, 'offsets': offsets,
+            'unique_ids': df_stints['UniqueID'].to_numpy(dtype=str), 'teams': df_stints['TEAM'].to_numpy(dtype=str), 'seasons': df_stints['SEASON'].to_numpy(dtype=str),
+            'same_season': same_season, 'clusters': clusters, 'prev_clusters': prev_clusters, 'freqs': freqs, 'percentiles': percentiles, 'freq_deltas': freq_deltas}
+
+
+if __name__ == "__main__":
+    from google.cloud import storage
+
+    # Data to df ; local code: #df = pd.read_excel('AllSeasons_PlayTypeStats.xlsx')
+    print('Importing data', '\n')
+    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'C:\\Users\\nrankin\\PycharmProjects\\Portfolio\\GCP\\clientcreds_storage_sa.json'
+    bucket_name = 'nmrankin0_nbaappfiles'
+    df = pd.read_csv('gs://' + bucket_name + '/AllSeasons_PlayTypeStats.csv')
+    df_clus = pd.read_csv('gs://' + bucket_name + '/AllSeasons_ClusteredFreqs.csv')
+
+    trajectories = build_player_trajectories(df, df_clus)
+
+    # ---------------- OUTPUT TRAJECTORY INDEX ---------------- #
+    print('Outputting player trajectory index', '\n')
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **trajectories)
+
+    # Output to GCS ; local code : # open('AllSeasons_PlayerTrajectories.npz', 'wb').write(buffer.getvalue())
+    storage_client = storage.Client()
+    bucket = storage_client.get_bucket(bucket_name)
+    bucket.blob('AllSeasons_PlayerTrajectories.npz').upload_from_string(buffer.getvalue(), 'application/octet-stream')
+
+    print('Output complete', '\n')
@@ -0,0 +1,574 @@
+'''
+File Purpose:
+    - Load test the NBA Offensive Profile web application with concurrent virtual users to size deployments and catch latency regressions
+
+Program Flow:
+    - Generate local fixture data (unless a data folder or an already-running app URL is given)
+    - Boot a single worker of the web application against the fixture data
+    - For each concurrency stage in the ramp, run virtual users that replay realistic interaction scripts:
+        - Load the page (firing the initial callbacks), switch seasons, select 1-5 players one at a time, pick teams to profile, open/close the info modals
+    - Every server callback is posted to '/_dash-update-component' exactly as the browser would, polling background callbacks until their result is ready
+    - The cluster scatter is fetched from its content-hashed route as the browser would, with each virtual user keeping its own HTTP cache of hashed figures
+    - Report throughput, p50/p95/p99 latency per callback, error rate and worker RSS (including background job processes) for each stage
+
+Program Input:
+    - Command line options (run with --help), e.g.: python LoadTest_NBAOffensiveProfileApp.py --ramp 1,5,10,25 --stage-seconds 30
+
+Program Output:
+    - Per-stage report printed to the console
+    - Optional JSON report written to the --report path
+
+'''
+
+# ------------- IMPORT PACKAGES ------------- #
+import argparse
+import gzip
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import psutil
+
+# Pipeline stages that build the app's derived artifacts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'DataCollectionAndAnalysis'))
+from P3b_AggProfiles import build_agg_profiles
+from P3c_PlayerTrajectories import build_player_trajectories
+
+
+# ------------- FIXTURE DATA ------------- #
+playtype_words_list = ['Transition', 'Isolation', 'Pick & Roll Ball Handler', 'Pick & Roll Roll Man', 'Post Up', 'Spot Up', 'Handoff', 'Cut', 'Off Screen', 'Putbacks', 'Misc']
+
+team_list = ['ATL', 'BOS', 'BKN', 'CHA', 'CHI', 'CLE', 'DAL', 'DEN', 'DET', 'GSW', 'HOU', 'IND', 'LAC', 'LAL', 'MEM',
+             'MIA', 'MIL', 'MIN', 'NOP', 'NYK', 'OKC', 'ORL', 'PHI', 'PHX', 'POR', 'SAC', 'SAS', 'TOR', 'UTA', 'WAS']
+
+
+def build_fixture_data(out_dir, n_players=450, seasons=('2021-22', '2022-23'), n_clusters=8, seed=50):
+    """
+    Write synthetic 'AllSeasons_*' files shaped like the pipeline output
+    """
+    rng = np.random.default_rng(seed)
+
+    stats_rows = []
+    clus_rows = []
+    for season in seasons:
+        for player_num in range(n_players):
+            player = 'Player {0:03d}'.format(player_num)
+
+            # Some players are traded mid-season and have a stint with a second team
+            teams = rng.choice(team_list, size=2 if rng.random() < 0.1 else 1, replace=False)
+            for team in teams:
+                unq_id = player + ' - ' + team + ' - ' + season
+
+                # Each player engages in a random subset of play-types
+                n_playtypes = int(rng.integers(4, len(playtype_words_list) + 1))
+                playtypes = rng.choice(playtype_words_list, size=n_playtypes, replace=False)
+                freqs = rng.dirichlet(np.ones(n_playtypes)) * 100
+                total_poss = int(rng.integers(50, 1500))
+
+                freq_by_playtype = dict.fromkeys(playtype_words_list, 0.0)
+                for playtype, freq in zip(playtypes, freqs):
+                    freq_by_playtype[playtype] = round(freq, 1)
+                    ppp = round(rng.uniform(0.5, 1.5), 2)
+                    stats_rows.append({'PLAYER': player, 'TEAM': team, 'GP': int(rng.integers(10, 83)), 'POSS': max(1, int(total_poss * freq / 100)),
+                                       'Freq%': round(freq, 1), 'PPP': ppp, 'Percentile': round(rng.uniform(0, 100), 1), 'PlayType': playtype, 'SEASON': season})
+
+                clus_rows.append({'UniqueID': unq_id, 'PLAYER': player, 'TEAM': team, 'SEASON': season, **freq_by_playtype,
+                                  'SummedFreq': sum(freq_by_playtype.values()), 'Cluster': int(rng.integers(n_clusters)),
+                                  'PC1': rng.normal(0, 20), 'PC2': rng.normal(0, 20)})
+
+    df_stats = pd.DataFrame(stats_rows)
+    df_clus = pd.DataFrame(clus_rows)
+    df_stats.to_csv(os.path.join(out_dir, 'AllSeasons_PlayTypeStats.csv'), index=False)
+    df_clus.to_csv(os.path.join(out_dir, 'AllSeasons_ClusteredFreqs.csv'), index=False)
+
+    # Team & cluster aggregates & player trajectory index, built by the pipeline's own code
+    build_agg_profiles(df_stats, df_clus).to_csv(os.path.join(out_dir, 'AllSeasons_AggProfiles.csv'), index=False)
+    np.savez_compressed(os.path.join(out_dir, 'AllSeasons_PlayerTrajectories.npz'), **build_player_trajectories(df_stats, df_clus))
+
+
+# ------------- APP PROCESS ------------- #
+def boot_app(data_dir, port, boot_timeout):
+    """
+    Start a single web application worker against a local data folder & wait until it serves the page
+    """
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, NBA_APP_DATA_DIR=data_dir, PORT=str(port), HOST='127.0.0.1')
+    proc = subprocess.Popen([sys.executable, os.path.join(app_dir, 'P4_NBAOffensiveProfileApp.py')], cwd=app_dir, env=env)
+
+    base_url = 'http://127.0.0.1:{0}'.format(port)
+    deadline = time.time() + boot_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('App exited during start-up with code {0}'.format(proc.returncode))
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=2) as resp:
+                if resp.status == 200:
+                    return proc, base_url
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.5)
+
+    proc.terminate()
+    raise RuntimeError('App did not start within {0} seconds'.format(boot_timeout))
+
+
+def read_rss_mb(pid):
+    """
+    Read resident set size in MB of a worker process plus its child processes (e.g., background callback jobs) ; None if the worker is gone
+    """
+    try:
+        proc = psutil.Process(pid)
+        procs = [proc] + proc.children(recursive=True)
+    except psutil.Error:
+        return None
+
+    rss = 0
+    for p in procs:
+        # Children can exit between listing & reading
+        try:
+            rss += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss / 1024 / 1024
+
+
+# ------------- DASH CALLBACK REQUESTS ------------- #
+def dash_output_str(outputs, multi_output=False):
+    """
+    Build the 'output' string Dash uses to identify a callback, e.g. '..a.children...b.children..' for multi-output callbacks
+    """
+    ids = ['{0}.{1}'.format(i, prop) for i, prop in outputs]
+    if len(ids) == 1 and not multi_output:
+        return ids[0]
+    return '..' + '...'.join(ids) + '..'
+
+
+def dash_payload(outputs, inputs, changed_prop_ids, state=(), multi_output=False):
+    """
+    Build the JSON body the Dash renderer posts to '/_dash-update-component' ; multi_output for callbacks declared with a list of outputs
+    """
+    outputs_list = [{'id': i, 'property': prop} for i, prop in outputs]
+    return {
+        'output': dash_output_str(outputs, multi_output),
+        'outputs': outputs_list[0] if len(outputs_list) == 1 and not multi_output else outputs_list,
+        'inputs': [{'id': i, 'property': prop, 'value': value} for i, prop, value in inputs],
+        'changedPropIds': changed_prop_ids,
+        'state': [{'id': i, 'property': prop, 'value': value} for i, prop, value in state],
+    }
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Surface redirects as HTTPErrors so the redirect target can be checked against a virtual user's HTTP cache
+    """
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+no_redirect_opener = urllib.request.build_opener(NoRedirectHandler)
+
+# season-dd value in the app layout
+app_default_seasons = ['2022-23', '2021-22']
+
+
+class Recorder:
+    """
+    Thread-safe store of (stage, request name, latency, ok) samples
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []
+
+    def add(self, stage, name, latency, ok):
+        with self.lock:
+            self.samples.append((stage, name, latency, ok))
+
+
+class VirtualUser:
+    """
+    Replay a realistic interaction script against the app until the stop event is set
+    """
+    def __init__(self, base_url, stage, recorder, stop_event, think_ms, poll_ms, seasons, max_players, timeout, seed):
+        self.base_url = base_url
+        self.stage = stage
+        self.recorder = recorder
+        self.stop_event = stop_event
+        self.think_ms = think_ms
+        self.poll_ms = poll_ms
+        self.seasons = seasons
+        self.max_players = max_players
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+
+        # Content-hashed figure URLs are immutable, so the browser only downloads each one once
+        self.http_cache = set()
+
+        # Background job hand-off & cancel stores, kept in the browser between callbacks
+        self.heavy_selection = None
+        self.heavy_cancel = None
+
+        # Dropdown values carried between interactions, as the browser keeps them
+        self.sel_players = None
+        self.agg_groups = None
+
+    def send(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        req = urllib.request.Request(self.base_url + path, data=data, headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+
+        ok = False
+        payload = None
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                raw = resp.read()
+                ok = resp.status in (200, 202, 204)
+                if body is not None and resp.status != 204:
+                    if resp.headers.get('Content-Encoding') == 'gzip':
+                        raw = gzip.decompress(raw)
+                    payload = json.loads(raw)
+                elif body is not None:
+                    payload = {'response': None}
+        except (urllib.error.URLError, ConnectionError, OSError, ValueError):
+            pass
+        return ok, payload
+
+    def request(self, name, path, body=None):
+        start = time.perf_counter()
+        ok, payload = self.send(path, body)
+        self.recorder.add(self.stage, name, time.perf_counter() - start, ok)
+        return payload
+
+    def background_request(self, name, path, body):
+        # Background callbacks answer with a job id, then the browser re-posts on an interval until the result is ready
+        start = time.perf_counter()
+        ok, payload = self.send(path, body)
+        if ok and payload is not None and 'job' in payload and 'response' not in payload:
+            poll_path = '{0}?cacheKey={1}&job={2}'.format(path, payload['cacheKey'], payload['job'])
+            deadline = start + self.timeout
+            while True:
+                time.sleep(self.poll_ms / 1000)
+                ok, payload = self.send(poll_path, body)
+                if not ok or payload is None or 'response' in payload:
+                    break
+                if time.perf_counter() > deadline:
+                    ok = False
+                    break
+        self.recorder.add(self.stage, name, time.perf_counter() - start, ok)
+        return payload
+
+    def think(self):
+        # Users pause between interactions ; exponential think time around the requested mean
+        if self.think_ms > 0:
+            self.stop_event.wait(self.rng.expovariate(1000 / self.think_ms))
+
+    def update_player_dd(self, sel_seasons, changed_props):
+        body = dash_payload([('player-dd', 'options')], [('season-dd', 'value', sel_seasons)], changed_props)
+        resp = self.request('update_player_dd', '/_dash-update-component', body)
+        try:
+            return [i if isinstance(i, str) else i['value'] for i in resp['response']['player-dd']['options']]
+        except (TypeError, KeyError):
+            return []
+
+    def fetch_scatter(self, sel_seasons):
+        # The scatter's clientside callback fetches the redirect to the current content hash, then the hashed figure unless it's already cached
+        start = time.perf_counter()
+        ok = False
+        path = '/figures/scatter/{0}.json'.format(','.join(sorted(set(sel_seasons))))
+        try:
+            with no_redirect_opener.open(self.base_url + path, timeout=self.timeout) as resp:
+                resp.read()
+        except urllib.error.HTTPError as e:
+            location = e.headers.get('Location')
+            e.close()
+            if e.code == 302 and location:
+                fig_url = urllib.parse.urljoin(self.base_url + path, location)
+                if fig_url in self.http_cache:
+                    ok = True
+                else:
+                    try:
+                        with urllib.request.urlopen(urllib.request.Request(fig_url, headers={'Accept-Encoding': 'gzip'}), timeout=self.timeout) as resp:
+                            resp.read()
+                            ok = resp.status == 200
+                    except (urllib.error.URLError, ConnectionError, OSError):
+                        pass
+                    if ok:
+                        self.http_cache.add(fig_url)
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        self.recorder.add(self.stage, 'scatter_fig', time.perf_counter() - start, ok)
+
+    def update_agg_profiles(self, sel_seasons, changed_props):
+        body = dash_payload(
+            [('agg-group-dd', 'options'), ('agg-container', 'children')],
+            [('agg-level-radio', 'value', 'Team'), ('agg-group-dd', 'value', self.agg_groups), ('season-dd', 'value', sel_seasons)],
+            changed_props)
+        resp = self.request('update_agg_profiles', '/_dash-update-component', body)
+        try:
+            return resp['response']['agg-group-dd']['options']
+        except (TypeError, KeyError):
+            return []
+
+    def show_traj_graph(self):
+        body = dash_payload([('traj-container', 'children')], [('traj-player-dd', 'value', None)], [])
+        self.request('show_traj_graph', '/_dash-update-component', body)
+
+    def season_callbacks(self, sel_seasons, changed_props):
+        # Every server callback (and the scatter fetch) listening to season-dd, as the browser fires them on a season switch & on page load
+        player_options = self.update_player_dd(sel_seasons, changed_props)
+        self.update_figures(sel_seasons, self.sel_players, changed_props)
+        self.fetch_scatter(sel_seasons)
+        agg_options = self.update_agg_profiles(sel_seasons, changed_props)
+        return player_options, agg_options
+
+    def update_figures(self, sel_seasons, sel_players, changed_props):
+        body = dash_payload(
+            [('figures-store', 'data'), ('heavy-selection-store', 'data'), ('heavy-cancel-store', 'data')],
+            [('season-dd', 'value', sel_seasons), ('player-dd', 'value', sel_players)],
+            changed_props,
+            [('heavy-selection-store', 'data', self.heavy_selection), ('heavy-cancel-store', 'data', self.heavy_cancel)])
+        resp = self.request('update_figures', '/_dash-update-component', body)
+        try:
+            response = resp['response']
+        except (TypeError, KeyError):
+            return
+
+        # Moving away from a pending large selection fires Dash's cancel callback
+        if 'heavy-cancel-store' in response:
+            self.heavy_cancel = response['heavy-cancel-store']['data']
+            body = dash_payload([('heavy-cancel-store', 'id')], [('heavy-cancel-store', 'data', self.heavy_cancel)], ['heavy-cancel-store.data'], multi_output=True)
+            self.request('cancel_heavy_figures', '/_dash-update-component', body)
+
+        # Large selections hand their frequency & efficiency figures to a background callback
+        if 'heavy-selection-store' in response:
+            self.heavy_selection = response['heavy-selection-store']['data']
+            body = dash_payload([('heavy-figures-store', 'data')], [('heavy-selection-store', 'data', self.heavy_selection)], ['heavy-selection-store.data'])
+            self.background_request('update_heavy_figures', '/_dash-update-component', body)
+
+    def run(self):
+        # Page load
+        for name, path in [('page', '/'), ('layout', '/_dash-layout'), ('dependencies', '/_dash-dependencies')]:
+            self.request(name, path)
+
+        # Initial callbacks, fired with no changed props
+        self.season_callbacks(app_default_seasons, [])
+        self.show_traj_graph()
+
+        while not self.stop_event.is_set():
+            # Switch seasons ; the current player & team selections are kept
+            sel_seasons = self.rng.sample(self.seasons, self.rng.randint(1, min(2, len(self.seasons))))
+            player_options, agg_options = self.season_callbacks(sel_seasons, ['season-dd.value'])
+            self.think()
+
+            # Select 1-5 (or up to --max-players) players, one at a time, replacing the previous selection
+            sel_players = []
+            for player in self.rng.sample(player_options, min(len(player_options), self.rng.randint(1, self.max_players))):
+                if self.stop_event.is_set():
+                    return
+                sel_players.append(player)
+                self.sel_players = list(sel_players)
+                self.update_figures(sel_seasons, self.sel_players, ['player-dd.value'])
+                self.fetch_scatter(sel_seasons)
+                self.think()
+
+            # Sometimes pick 1-3 teams to profile ; they stay selected (and are rebuilt) across later season switches
+            if agg_options and self.rng.random() < 0.3:
+                self.agg_groups = self.rng.sample(agg_options, min(len(agg_options), self.rng.randint(1, 3)))
+                self.update_agg_profiles(sel_seasons, ['agg-group-dd.value'])
+                self.think()
+
+            # Open & close an info modal ; these are clientside callbacks so the user only spends time reading
+            if self.rng.random() < 0.3:
+                self.think()
+
+
+# ------------- CACHEABLE RESOURCE CHECKS ------------- #
+def check_conditional_request(base_url, path):
+    """
+    Check that a compressed response's ETag, echoed back in If-None-Match, gets a 304 Not Modified
+    """
+    headers = {'Accept-Encoding': 'gzip'}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base_url + path, headers=headers), timeout=60) as resp:
+            etag = resp.headers.get('ETag')
+            url = resp.geturl()
+            encoding = resp.headers.get('Content-Encoding')
+    except (urllib.error.URLError, ConnectionError, OSError) as e:
+        return False, 'initial request failed ({0})'.format(e)
+
+    if not etag:
+        return False, 'no ETag returned'
+
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=dict(headers, **{'If-None-Match': etag})), timeout=60) as resp:
+            return False, 'If-None-Match {0} returned {1}'.format(etag, resp.status)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return True, 'If-None-Match {0} ({1}) returned 304'.format(etag, encoding or 'uncompressed')
+        return False, 'If-None-Match {0} returned {1}'.format(etag, e.code)
+    except (urllib.error.URLError, ConnectionError, OSError) as e:
+        return False, 'conditional request failed ({0})'.format(e)
+
+
+def check_cacheable_resources(base_url, seasons):
+    """
+    Run conditional request checks against the cacheable routes ; returns True if all pass
+    """
+    paths = ['/figures/scatter/{0}.json'.format(','.join(seasons)), '/api/v1/profiles?season={0}&page_size=1000'.format(seasons[0])]
+
+    # Trajectory of the first player in the data
+    all_ok = True
+    try:
+        with urllib.request.urlopen(base_url + '/api/v1/profiles?fields=PLAYER&page_size=1', timeout=60) as resp:
+            paths.append('/api/v1/trajectories/' + urllib.parse.quote(json.loads(resp.read())['data'][0]['PLAYER']))
+    except (urllib.error.URLError, ConnectionError, OSError, ValueError, KeyError, IndexError) as e:
+        print('Conditional request check /api/v1/trajectories: FAILED - no player to check ({0})'.format(e))
+        all_ok = False
+
+    for path in paths:
+        ok, detail = check_conditional_request(base_url, path)
+        print('Conditional request check {0}: {1} - {2}'.format(path, 'OK' if ok else 'FAILED', detail))
+        all_ok = all_ok and ok
+    print()
+    return all_ok
+
+
+# ------------- REPORTING ------------- #
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return float('nan')
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize_stage(samples, stage, duration, rss_list):
+    """
+    Summarize throughput, latency percentiles (ms) per request name, error rate and RSS for a single stage
+    """
+    stage_samples = [i for i in samples if i[0] == stage]
+    summary = {'concurrency': stage, 'requests': len(stage_samples), 'throughput_rps': len(stage_samples) / duration if duration else 0.0,
+               'error_rate': (sum(1 for i in stage_samples if not i[3]) / len(stage_samples)) if stage_samples else 0.0,
+               'rss_mb_max': max(rss_list) if rss_list else None, 'rss_mb_end': rss_list[-1] if rss_list else None, 'callbacks': {}}
+
+    for name in sorted(set(i[1] for i in stage_samples)):
+        latencies = sorted(i[2] * 1000 for i in stage_samples if i[1] == name)
+        errors = sum(1 for i in stage_samples if i[1] == name and not i[3])
+        summary['callbacks'][name] = {'count': len(latencies), 'errors': errors, 'p50_ms': percentile(latencies, 50), 'p95_ms': percentile(latencies, 95), 'p99_ms': percentile(latencies, 99)}
+
+    return summary
+
+
+def print_summary(summary):
+    rss = 'n/a' if summary['rss_mb_max'] is None else '{0:.1f} MB max / {1:.1f} MB end'.format(summary['rss_mb_max'], summary['rss_mb_end'])
+    print('Concurrency {0}: {1} requests, {2:.1f} req/s, error rate {3:.2%}, worker RSS {4}'.format(summary['concurrency'], summary['requests'], summary['throughput_rps'], summary['error_rate'], rss))
+    print('    {0:<20}{1:>8}{2:>8}{3:>10}{4:>10}{5:>10}'.format('callback', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, stats in summary['callbacks'].items():
+        print('    {0:<20}{1:>8}{2:>8}{3:>10.1f}{4:>10.1f}{5:>10.1f}'.format(name, stats['count'], stats['errors'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+    print()
+
+
+# ------------- RUN LOAD TEST ------------- #
+def run_stage(base_url, concurrency, stage_seconds, recorder, args, pid):
+    """
+    Run a fixed number of virtual users for the stage duration while sampling worker RSS
+    """
+    stop_event = threading.Event()
+    users = [VirtualUser(base_url, concurrency, recorder, stop_event, args.think_ms, args.poll_ms, args.seasons, args.max_players, args.timeout, seed=args.seed + concurrency * 1000 + i) for i in range(concurrency)]
+    threads = [threading.Thread(target=u.run, daemon=True) for u in users]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+
+    rss_list = []
+    while time.perf_counter() - start < stage_seconds:
+        if pid is not None:
+            rss = read_rss_mb(pid)
+            if rss is not None:
+                rss_list.append(rss)
+        time.sleep(0.5)
+
+    stop_event.set()
+    for t in threads:
+        t.join(timeout=args.timeout)
+
+    return time.perf_counter() - start, rss_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent-user load test for the NBA Offensive Profile web application')
+    parser.add_argument('--url', help='Target an already-running app instead of booting one (e.g., http://127.0.0.1:8050)')
+    parser.add_argument('--pid', type=int, help='Worker PID to sample RSS from when using --url')
+    parser.add_argument('--data-dir', help='Folder with AllSeasons_*.csv files ; synthetic fixture data is generated when omitted')
+    parser.add_argument('--fixture-players', type=int, default=450, help='Players per season in generated fixture data')
+    parser.add_argument('--port', type=int, default=8051)
+    parser.add_argument('--ramp', default='1,5,10,25', help='Comma separated concurrency stages')
+    parser.add_argument('--stage-seconds', type=float, default=30)
+    parser.add_argument('--think-ms', type=float, default=250, help='Mean think time between interactions (0 for none)')
+    parser.add_argument('--poll-ms', type=float, default=500, help='Background callback polling interval (matches the app callback interval)')
+    parser.add_argument('--max-players', type=int, default=5, help='Most players a user selects per season switch (6+ exercises background callbacks)')
+    parser.add_argument('--seasons', default='2021-22,2022-23', help='Comma separated seasons users switch between')
+    parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds')
+    parser.add_argument('--boot-timeout', type=float, default=120)
+    parser.add_argument('--seed', type=int, default=50)
+    parser.add_argument('--report', help='Write the JSON report to this path')
+    args = parser.parse_args()
+    args.seasons = args.seasons.split(',')
+
+    proc = None
+    tmp_dir = None
+    try:
+        # Boot app against fixture data unless targeting a running app
+        if args.url:
+            base_url = args.url.rstrip('/')
+            pid = args.pid
+        else:
+            data_dir = args.data_dir
+            if not data_dir:
+                tmp_dir = tempfile.TemporaryDirectory()
+                data_dir = tmp_dir.name
+                print('Generating fixture data', '\n')
+                build_fixture_data(data_dir, n_players=args.fixture_players, seasons=args.seasons, seed=args.seed)
+
+            print('Booting app', '\n')
+            proc, base_url = boot_app(data_dir, args.port, args.boot_timeout)
+            pid = proc.pid
+
+        # Cacheable resources must revalidate (304) even when the response was compressed
+        check_cacheable_resources(base_url, args.seasons)
+
+        # Ramp through concurrency stages
+        recorder = Recorder()
+        summaries = []
+        for concurrency in [int(i) for i in args.ramp.split(',')]:
+            print('Running {0} virtual users for {1} seconds'.format(concurrency, args.stage_seconds), '\n')
+            duration, rss_list = run_stage(base_url, concurrency, args.stage_seconds, recorder, args, pid)
+            summary = summarize_stage(recorder.samples, concurrency, duration, rss_list)
+            print_summary(summary)
+            summaries.append(summary)
+
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(summaries, f, indent=2)
+
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
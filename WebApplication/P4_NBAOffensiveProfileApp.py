@@ -5,7 +5,11 @@
 import dash
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output
+from dash import DiskcacheManager
+from dash.dependencies import Input, Output, State
+import flask
+from flask_compress import Compress
+import diskcache
 
 
 # --------- OTHER MODULES --------- #
@@ -15,6 +19,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 import os
 import gcsfs
+import numpy as np
+import io
+import json
+import hashlib
+from functools import lru_cache
+from werkzeug.http import parse_etags
 
 
 ####################################
@@ -76,12 +86,29 @@ def build_modal_info_overlay(id, side, content):
 
 bucket_name = 'nmrankin0_nbaappfiles'
 
-fs = gcsfs.GCSFileSystem(project='nbaoffensiveprofile', token=os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'))
-with fs.open('gs://' + bucket_name + '/AllSeasons_ClusteredFreqs.csv') as f:
-    df_clus = pd.read_csv(f)
+# Local data folder (e.g., load-testing fixture data) ; otherwise read from GCS
+data_dir = os.environ.get('NBA_APP_DATA_DIR')
 
-with fs.open('gs://' + bucket_name + '/AllSeasons_PlayTypeStats.csv') as f:
-    df_freq_eff = pd.read_csv(f)
+if data_dir:
+    df_clus = pd.read_csv(os.path.join(data_dir, 'AllSeasons_ClusteredFreqs.csv'))
+    df_freq_eff = pd.read_csv(os.path.join(data_dir, 'AllSeasons_PlayTypeStats.csv'))
+    df_agg = pd.read_csv(os.path.join(data_dir, 'AllSeasons_AggProfiles.csv'))
+    with open(os.path.join(data_dir, 'AllSeasons_PlayerTrajectories.npz'), 'rb') as f:
+        traj_bytes = f.read()
+
+else:
+    fs = gcsfs.GCSFileSystem(project='nbaoffensiveprofile', token=os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'))
+    with fs.open('gs://' + bucket_name + '/AllSeasons_ClusteredFreqs.csv') as f:
+        df_clus = pd.read_csv(f)
+
+    with fs.open('gs://' + bucket_name + '/AllSeasons_PlayTypeStats.csv') as f:
+        df_freq_eff = pd.read_csv(f)
+
+    with fs.open('gs://' + bucket_name + '/AllSeasons_AggProfiles.csv') as f:
+        df_agg = pd.read_csv(f)
+
+    with fs.open('gs://' + bucket_name + '/AllSeasons_PlayerTrajectories.npz') as f:
+        traj_bytes = f.read()
 
 # Season dropdown
 season_dd = df_clus['SEASON'].unique().tolist()
@@ -90,6 +117,18 @@ season_dd = df_clus['SEASON'].unique().tolist()
 df_freq_eff['UniqueID'] = df_freq_eff['PLAYER'] + ' - ' + df_freq_eff['TEAM'] + ' - ' + df_freq_eff['SEASON']
 player_dd = sorted(df_clus[df_clus['SEASON'] == '2022-23']['UniqueID'].tolist())
 
+# Team & cluster aggregate profiles (precomputed in the pipeline) ; clusters are labelled the same way as the scatter legend
+clus_label_dict = {str(clus): 'Cluster' + str(i+1) for i, clus in enumerate(sorted(df_clus['Cluster'].unique().tolist()))}
+df_agg['Group'] = df_agg['Group'].astype(str)
+df_agg['GroupLabel'] = df_agg['Group'].where(df_agg['Level'] != 'Cluster', df_agg['Group'].map(clus_label_dict))
+df_agg['AggID'] = df_agg['GroupLabel'] + ' - ' + df_agg['SEASON']
+
+# Player trajectory index (precomputed in the pipeline) ; each player's stints are one contiguous block of the stint arrays
+with np.load(io.BytesIO(traj_bytes), allow_pickle=False) as npz:
+    traj = {k: npz[k] for k in npz.files}
+trajectory_index = {player: (int(traj['offsets'][i]), int(traj['offsets'][i+1])) for i, player in enumerate(traj['players'].tolist())}
+traj_player_dd = traj['players'].tolist()
+
 # Play types
 playtype_words_list = ['Transition', 'Isolation', 'Pick & Roll Ball Handler', 'Pick & Roll Roll Man', 'Post Up', 'Spot Up', 'Handoff', 'Cut','Off Screen', 'Putbacks', 'Misc']
 
@@ -97,41 +136,79 @@ playtype_words_list = ['Transition', 'Isolation', 'Pick & Roll Ball Handler', 'P
 # Get 20+ colors for clusters
 clus_color_list = px.colors.qualitative.Plotly + px.colors.qualitative.T10
 
-# Create scatter trace for each cluster
-fig_scatter = go.Figure()
-clus_num_iter = 0
-for clus in sorted(df_clus['Cluster'].unique().tolist()):
-    for player_unq_id in df_clus[df_clus['Cluster'] == clus]['UniqueID'].tolist():
-        x = df_clus[df_clus['UniqueID'] == player_unq_id]['PC1']
-        y = df_clus[df_clus['UniqueID'] == player_unq_id]['PC2']
-        name = df_clus[df_clus['UniqueID'] == player_unq_id]['UniqueID'].tolist()[0]
 
-        fig_scatter.add_trace(go.Scatter(x=x, y=y, mode='markers', name=name, showlegend=False, hoverinfo='text', hovertext=name, marker=dict(color=clus_color_list[clus_num_iter])))
+def build_scatter_fig(df_filtered):
+    """
+    Build cluster scatter figure for the filtered data
+    """
+    # Create scatter trace for each cluster
+    fig_scatter = go.Figure()
+    clus_num_iter = 0
+    for clus in sorted(df_filtered['Cluster'].unique().tolist()):
+        for row in df_filtered[df_filtered['Cluster'] == clus][['UniqueID', 'PC1', 'PC2']].itertuples(index=False):
+            name = row.UniqueID
 
-    # Add legend entry
-    fig_scatter.add_trace(go.Scatter(x=[None], y=[None], name=('Cluster' + str(clus_num_iter+1)), mode='markers', marker=dict(color=clus_color_list[clus_num_iter])))
+            fig_scatter.add_trace(go.Scatter(x=[row.PC1], y=[row.PC2], mode='markers', name=name, showlegend=False, hoverinfo='text', hovertext=name, marker=dict(color=clus_color_list[clus_num_iter])))
 
-    # Iterate for next clus
-    clus_num_iter += 1
+        # Add legend entry
+        fig_scatter.add_trace(go.Scatter(x=[None], y=[None], name=('Cluster' + str(clus_num_iter+1)), mode='markers', marker=dict(color=clus_color_list[clus_num_iter])))
 
+        # Iterate for next clus
+        clus_num_iter += 1
 
-# Remove axes
-#x axis
-fig_scatter.update_xaxes(visible=False)
-fig_scatter.update_yaxes(visible=False)
+    # Remove axes
+    #x axis
+    fig_scatter.update_xaxes(visible=False)
+    fig_scatter.update_yaxes(visible=False)
+
+    # Change Plot & BG Color
+    fig_scatter.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')           # 'aliceblue' is closer to default color
+
+    # Increase Marker Size
+    fig_scatter.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
+
+    return fig_scatter
+
+
+@lru_cache(maxsize=64)
+def get_base_scatter(season_key):
+    """
+    Build (once) the base cluster scatter JSON for a sorted tuple of seasons, along with its content hash
+    """
+    df_filtered = df_clus[df_clus['SEASON'].isin(season_key)]
+    fig_json = build_scatter_fig(df_filtered).to_json()
+    fig_hash = hashlib.sha256(fig_json.encode('utf-8')).hexdigest()[:16]
+    return fig_json, fig_hash
 
-# Change Plot & BG Color
-fig_scatter.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')           # 'aliceblue' is closer to default color
 
-# Increase Marker Size
-fig_scatter.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
+# Warm base scatters for each season & the default selection ; the browser loads them from the content-hashed routes below
+for season_key in [(i,) for i in season_dd] + [('2021-22', '2022-23')]:
+    if set(season_key).issubset(season_dd):
+        get_base_scatter(season_key)
 
 
 #####################
 ## DASH APP LAYOUT ##
 #####################
+# Build Flask server
+server = flask.Flask(__name__)
+
+# Only large player selections build their frequency & efficiency figures in a background job ; everything else runs in the request
+# Jobs get their own disk cache (with a generous lock timeout so concurrent jobs don't fail) ; finished figures are memoized in a separate
+# disk cache tied to the loaded data, which is checked in-process before any job is started
+cache_dir = os.environ.get('NBA_APP_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+data_version = str(pd.util.hash_pandas_object(df_clus).sum()) + '-' + str(pd.util.hash_pandas_object(df_freq_eff).sum())
+background_min_players = 6
+figure_cache_expire = 3600
+figure_cache = diskcache.Cache(os.path.join(cache_dir, 'figures'), timeout=300)
+background_callback_manager = DiskcacheManager(diskcache.Cache(os.path.join(cache_dir, 'jobs'), timeout=300))
+
 # Build Dash layout
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, server=server, background_callback_manager=background_callback_manager)
+
+# Compress responses (brotli, else gzip) ; set up after Dash since Dash forces COMPRESS_ALGORITHM to gzip only
+server.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+Compress(server)
 
 app.layout = html.Div(
     children=[
@@ -184,6 +261,29 @@ app.layout = html.Div(
                     )
                 ),
 
+                build_modal_info_overlay("aggregate", "top", dedent(
+                """
+                The _**Team & Cluster Profiles**_ panel displays the combined offensive profile of a team, or of an offensive profile archetype (cluster), for the selected season(s).
+                
+                - Select _**Team**_ or _**Cluster**_, then select 1 or more teams/clusters within the dropdown
+                - Each bar is sliced by _**offensive play-type**_ and displays how frequently the team/cluster's possessions come from each play-type
+                - Hover over a slice to see the _**Points Per Possession Percentile**_ for the play-type, averaged across its players and weighted by how many possessions each player used
+                """
+                    )
+                ),
+
+                build_modal_info_overlay("trajectory", "top", dedent(
+                """
+                The _**Player Trajectory**_ panel shows how a player's offensive profile has changed over their career, across every team and season in the data.
+                
+                - Select a player within the _**'Select a Player'**_ dropdown. This dropdown is independent of the season & player selections above
+                - Each line is an _**offensive play-type**_ and displays how frequently the player engaged in it for each team & season
+                - Each team & season is labelled with the player's offensive profile archetype (cluster). Hover over a point to see the change since the player's previous season, the _**Points Per Possession Percentile**_, and any change in cluster since the previous season
+                - A player traded mid-season has one point per team that season, marked with _**\***_. The data doesn't record which of those stints came first, so they are ordered by team
+                """
+                    )
+                ),
+
                 # Banner
                 html.Div(children=
                     [
@@ -192,8 +292,17 @@ app.layout = html.Div(
                     ]
                 ),
 
+                # Progress of background figure builds (only shown while they run)
+                html.Progress(id="figures-progress", value="0", max="2", style={"display": "none"}),
+
+                # Frequency & efficiency figures for the current selection (built in the request, or in the background for large selections)
+                dcc.Store(id='figures-store'),
+                dcc.Store(id='heavy-selection-store'),
+                dcc.Store(id='heavy-cancel-store'),
+                dcc.Store(id='heavy-figures-store'),
+
                 # Cluster visual
-                html.Div(children=[html.H4(["Clustering Players based on Offensive Play-Type Frequency", html.Img(id="show-cluster-modal", src="assets/question_circle.png", className="info-icon")], className="container_title"), html.Div(id="player-scatter-container", children=[dcc.Graph(id="player-scatter", figure=fig_scatter, config={"displayModeBar": False})])], className="twelve columns pretty_container", style={"width": "98%", "margin-right": "0"}, id="cluster-div"),
+                html.Div(children=[html.H4(["Clustering Players based on Offensive Play-Type Frequency", html.Img(id="show-cluster-modal", src="assets/question_circle.png", className="info-icon")], className="container_title"), dcc.Graph(id="player-scatter", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})], className="twelve columns pretty_container", style={"width": "98%", "margin-right": "0"}, id="cluster-div"),
 
                 # Frequency & efficiency visuals
                 html.Div(children=
@@ -202,6 +311,23 @@ app.layout = html.Div(
                             html.Div(children=[html.H4(["Selected Players - Efficiency by Offensive Play-Type", html.Img(id="show-efficiency-modal", src="assets/question_circle.png", className="info-icon")], className="container_title"), html.Div(id="player-eff-container", children=[dcc.Graph(id="eff-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})])], className="six columns pretty_container", id="efficiency-div"),
                             ]
                         ),
+
+                # Team & cluster aggregate visual
+                html.Div(children=
+                            [
+                            html.H4(["Team & Cluster Profiles - Frequency by Offensive Play-Type", html.Img(id="show-aggregate-modal", src="assets/question_circle.png", className="info-icon")], className="container_title"),
+                            dcc.RadioItems(id='agg-level-radio', options=['Team', 'Cluster'], value='Team', inline=True),
+                            dcc.Dropdown(id='agg-group-dd', multi=True, placeholder="Select 1 or More Teams/Clusters"),
+                            html.Div(id="agg-container", children=[dcc.Graph(id="agg-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})])
+                            ], className="twelve columns pretty_container", id="aggregate-div"),
+
+                # Player trajectory visual
+                html.Div(children=
+                            [
+                            html.H4(["Player Trajectory - Frequency by Offensive Play-Type Across Teams & Seasons", html.Img(id="show-trajectory-modal", src="assets/question_circle.png", className="info-icon")], className="container_title"),
+                            dcc.Dropdown(id='traj-player-dd', options=traj_player_dd, placeholder="Select a Player"),
+                            html.Div(id="traj-container", children=[dcc.Graph(id="traj-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})])
+                            ], className="twelve columns pretty_container", id="trajectory-div"),
             ]
         ),
 
@@ -224,30 +350,38 @@ app.layout = html.Div(
 ## CREATE CALLBACKS & RUN APP ##
 ################################
 # ------------- MODAL INFO QUESTION BUTTON CALLBACKS ------------- #
-for id in ["cluster", "frequency", "efficiency"]:
-    @app.callback(
+# Modal toggling is purely cosmetic, so it runs in the browser rather than costing a server round trip
+for id in ["cluster", "frequency", "efficiency", "aggregate", "trajectory"]:
+    app.clientside_callback(
+        """
+        function(n_show, n_close) {
+            // Enable us to check what button was clicked
+            const triggered = dash_clientside.callback_context.triggered;
+
+            // If its one of the modal buttons, display the block of text
+            if (triggered.length && triggered[0].prop_id.startsWith("show-")) {
+                return [{"display": "block"}, {"zIndex": 1003}];
+            }
+            return [{"display": "none"}, {"zIndex": 0}];
+        }
+        """,
         [Output(f"{id}-modal", "style"), Output(f"{id}-div", "style")],
         [Input(f"show-{id}-modal", "n_clicks"), Input(f"close-{id}-modal", "n_clicks")] )
-    def toggle_modal(n_show, n_close):
-        # Enable us to check what button was clicked
-        ctx = dash.callback_context
-
-        # If its one of the modal buttons, display the block of text
-        if ctx.triggered and ctx.triggered[0]["prop_id"].startswith("show-"):
-            return {"display": "block"}, {"zIndex": 1003}
-        else:
-            return {"display": "none"}, {"zIndex": 0}
 
 
 # ------------- SEASONS FILTER CALLBACKS ------------- #
-# Update season filter to always default to current season if it is nullified
-@app.callback(Output('season-dd', 'value'), [Input('season-dd', 'value')])
-def update_season_dd(sel_season_val_list):
-    # Get dropdown value on app initialization. It initiates as string so we need to make into list
-    if type(sel_season_val_list) == str or not sel_season_val_list:
-        return ['2022-23']
-    else:
-        return sel_season_val_list
+# Update season filter to always default to current season if it is nullified (runs in the browser)
+app.clientside_callback(
+    """
+    function(sel_season_val_list) {
+        // Get dropdown value on app initialization. It initiates as string so we need to make into list
+        if (typeof sel_season_val_list === "string" || !sel_season_val_list || !sel_season_val_list.length) {
+            return ["2022-23"];
+        }
+        return dash_clientside.no_update;
+    }
+    """,
+    Output('season-dd', 'value'), [Input('season-dd', 'value')])
 
 
 # Filter Player Dropdown based on selected season
@@ -265,216 +399,526 @@ def update_player_dd(sel_season_val_list):
     return updated_player_dd
 
 
-# ------------- SCATTER PLOT VISUAL CALLBACKS ------------- #
-# Update cluster scatter plot based on selected season
-@app.callback(Output('player-scatter-container', 'children'), [Input('season-dd', 'value'), Input('player-dd', 'value')])
-def update_scatter(sel_season_val_list, sel_player_val_list):
-    # Get dropdown value on app initialization. It initiates as string so we need to make into list
-    if type(sel_season_val_list) == str:
-        sel_season_val_list = ['2022-23']
-    else:
-        pass
+# ------------- FIGURE BUILDERS FOR SELECTED PLAYERS ------------- #
+def build_freq_fig(df_update):
+    """
+    Build play-type frequency bar chart for the selected players
+    """
+    new_fig_freq = px.bar(df_update, x="UniqueID", y="Freq%", color="PlayType", labels={'x': 'PLAYER'}, color_discrete_sequence=px.colors.qualitative.Vivid, text=df_update["Freq%"].apply(lambda x: '{0:1.2f}%'.format(x)))
+
+    # Change Plot & BG Color
+    new_fig_freq.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')
+
+    return new_fig_freq
 
 
-    # WHEN THERE IS A VALUE IN SEASON DD (CONSTANT) ; NO VALUE IN PLAYER DD
-    if sel_season_val_list and not sel_player_val_list:
+def build_eff_fig(df_update):
+    """
+    Build play-type efficiency bar chart for the selected players, with bar widths scaled by frequency
+    """
+    sel_uniqid_list = df_update['UniqueID'].unique().tolist()
 
-        # Filter df based on selection and update dropdown
-        df_filtered = df_clus[df_clus['SEASON'].isin(sel_season_val_list)]
+    # Play types that no selected player engages in are not included in graph
+    exlude_playtype_list = [i for i in playtype_words_list if i not in set(df_update['PlayType'])]
+    filt_playtype_words_list = [i for i in playtype_words_list if i not in exlude_playtype_list]
 
-        # Get 20+ colors for clusters
-        clus_color_list = px.colors.qualitative.Plotly + px.colors.qualitative.T10
+    # Empty graph
+    new_fig_eff = go.Figure(data=[])
 
-        # Create scatter trace for each cluster
-        fig_scatter = go.Figure()
-        clus_num_iter = 0
-        for clus in sorted(df_filtered['Cluster'].unique().tolist()):
-            for player_unq_id in df_filtered[df_filtered['Cluster'] == clus]['UniqueID'].tolist():
-                x = df_filtered[df_filtered['UniqueID'] == player_unq_id]['PC1']
-                y = df_filtered[df_filtered['UniqueID'] == player_unq_id]['PC2']
-                name = df_filtered[df_filtered['UniqueID'] == player_unq_id]['UniqueID'].tolist()[0]
+    # For each selected player, update the graph with their stats
+    for uid in sel_uniqid_list:
+        df_uid = df_update[df_update['UniqueID'] == uid].drop_duplicates('PlayType').set_index('PlayType')
 
-                fig_scatter.add_trace(go.Scatter(x=x, y=y, mode='markers', name=name, showlegend=False, hoverinfo='text', hovertext=name, marker=dict(color=clus_color_list[clus_num_iter])))
+        ppp_list = []
+        freq_list = []
+        for playtype in filt_playtype_words_list:
+            # Add a check for if there is no value for that play type
+            if playtype in df_uid.index:
+                ppp = df_uid.at[playtype, 'Percentile']
+                freq = df_uid.at[playtype, 'Freq%']
+            else:
+                ppp = None
+                freq = 0
 
-            # Add legend entry
-            fig_scatter.add_trace(go.Scatter(x=[None], y=[None], name=('Cluster' + str(clus_num_iter+1)), mode='markers', marker=dict(color=clus_color_list[clus_num_iter])))
+            # Add stat to stat list
+            ppp_list.append(ppp)
+            freq_list.append(freq)
 
-            # Iterate for next clus
-            clus_num_iter += 1
+        # Rescale bar widths based on frequency
+        scaler = 0.009
+        scaled_freq_list = [i * scaler if i != 0 and i * scaler > 0.005 else 0.005 for i in freq_list]
 
-        # Remove axes
-        #x axis
-        fig_scatter.update_xaxes(visible=False)
-        fig_scatter.update_yaxes(visible=False)
+        # Add player data to fig
+        new_fig_eff.add_trace(go.Bar(name=uid, x=filt_playtype_words_list, y=ppp_list, width=scaled_freq_list, text=[str(i) + '%' if i is not None else '' for i in ppp_list],  textposition="outside"))
 
         # Change Plot & BG Color
-        fig_scatter.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')           # 'aliceblue' is closer to default color
+        new_fig_eff.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite', yaxis_title="Points Per Possession Percentile", xaxis_title="Play-Type", legend=dict(yanchor="top", orientation="h", y=1.1, xanchor="left", x=0.01), uniformtext=dict(minsize=12, mode='show'))           # 'aliceblue' is closer to default color
+
+    return new_fig_eff
+
 
-        # Increase Marker Size
-        fig_scatter.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
+# ------------- SCATTER, FREQUENCY & EFFICIENCY VISUAL CALLBACKS ------------- #
+def figure_cache_key(player_key):
+    return ('freq_eff', data_version) + tuple(player_key)
 
-        # return
-        return [dcc.Graph(id="player-scatter", figure=fig_scatter, config={"displayModeBar": False})]
 
-    # WHEN THERE IS A VALUE IN SEASON DD (CONSTANT) ; AND A VALUE IN PLAYER DD
-    elif sel_season_val_list and sel_player_val_list:
-        # Update current player drop down value based on season value
+# Load the cluster scatter in the browser from its content-hashed route so repeat views come from the browser's HTTP cache (only the small
+# redirect to the current hash goes to the server) instead of resending the figure in every callback ; selected players are highlighted client-side
+app.clientside_callback(
+    """
+    async function(sel_season_val_list, sel_player_val_list) {
+        // Get dropdown value on app initialization. It initiates as string so we need to make into list
+        if (typeof sel_season_val_list === "string" || !sel_season_val_list || !sel_season_val_list.length) {
+            sel_season_val_list = ["2022-23"];
+        }
+
+        // Only the latest selection is drawn if an earlier request resolves after it
+        const request_id = window.scatterRequestId = (window.scatterRequestId || 0) + 1;
+        const seasons = Array.from(new Set(sel_season_val_list)).sort().join(",");
+        const response = await fetch("/figures/scatter/" + seasons + ".json");
+        if (!response.ok || request_id !== window.scatterRequestId) {
+            return dash_clientside.no_update;
+        }
+        const fig = await response.json();
+        if (request_id !== window.scatterRequestId) {
+            return dash_clientside.no_update;
+        }
+
+        // Highlight selected players from the selected season(s), otherwise keep original marker formatting
+        const sel_players = new Set((sel_player_val_list || []).filter(player => sel_season_val_list.some(season => player.includes(season))));
+        fig.data.forEach(trace => {
+            if (sel_players.has(trace.name)) {
+                trace.marker = Object.assign({}, trace.marker, {size: 15, line: {width: 5.5, color: "#F8EE35"}});
+            }
+        });
+        return fig;
+    }
+    """,
+    Output('player-scatter', 'figure'),
+    [Input('season-dd', 'value'), Input('player-dd', 'value')])
+
+
+# Update the frequency & efficiency visuals from a single callback so the season/player selection is only reconciled and filtered once per interaction
+# Large selections that aren't memoized yet are handed to the background callback below instead of blocking a worker thread
+# Each hand-off is numbered (run) so a job is only cancelled when the dropdowns move away from it, and never restarted for an unchanged selection
+@app.callback(
+    [Output('figures-store', 'data'), Output('heavy-selection-store', 'data'), Output('heavy-cancel-store', 'data')],
+    [Input('season-dd', 'value'), Input('player-dd', 'value')],
+    [State('heavy-selection-store', 'data'), State('heavy-cancel-store', 'data')])
+def update_figures(sel_season_val_list, sel_player_val_list, heavy_selection, heavy_cancel):
+    # Get dropdown value on app initialization. It initiates as string so we need to make into list
+    if type(sel_season_val_list) == str or not sel_season_val_list:
+        sel_season_val_list = ['2022-23']
+    else:
+        pass
+
+    # Update current player drop down value based on season value
+    if sel_player_val_list:
         updated_player_list = []
         for player in sel_player_val_list:
             for season in sel_season_val_list:
                 if season in player:
                     updated_player_list.append(player)
-                    continue
+                    break
+    else:
+        updated_player_list = None
 
-        # Highlight selected players
-        if updated_player_list is not None:
+    # A job may still be building the last large selection, unless it was cancelled or its figures are already memoized
+    heavy_pending = bool(heavy_selection) and heavy_selection['run'] != (heavy_cancel or {}).get('run') and figure_cache_key(heavy_selection['key']) not in figure_cache
+    cancel_heavy = {'run': heavy_selection['run']} if heavy_pending else dash.no_update
 
-            # Filter df based on selection and update dropdown
-            df_filtered = df_clus[df_clus['SEASON'].isin(sel_season_val_list)]
+    # if no players are selected, leave graphs empty
+    if not updated_player_list:
+        return {'key': None, 'freq': blank_fig(row_heights[3]), 'eff': blank_fig(row_heights[3])}, dash.no_update, cancel_heavy
 
-            # Get 20+ colors for clusters
-            clus_color_list = px.colors.qualitative.Plotly + px.colors.qualitative.T10
+    # Figures only depend on which unique IDs are selected
+    player_key = sorted(set(updated_player_list))
+    figures = figure_cache.get(figure_cache_key(player_key))
 
-            # Create scatter trace for each cluster
-            fig_scatter = go.Figure()
-            clus_num_iter = 0
-            for clus in sorted(df_filtered['Cluster'].unique().tolist()):
-                for player_unq_id in df_filtered[df_filtered['Cluster'] == clus]['UniqueID'].tolist():
-                    x = df_filtered[df_filtered['UniqueID'] == player_unq_id]['PC1']
-                    y = df_filtered[df_filtered['UniqueID'] == player_unq_id]['PC2']
-                    name = df_filtered[df_filtered['UniqueID'] == player_unq_id]['UniqueID'].tolist()[0]
+    # Large selection that isn't memoized : build in the background, keeping the current graphs until it's ready
+    # A new hand-off terminates any superseded job ; an unchanged selection leaves its job running
+    if figures is None and len(player_key) >= background_min_players:
+        if heavy_pending and heavy_selection['key'] == player_key:
+            return {'key': player_key, 'pending': True}, dash.no_update, dash.no_update
+        return {'key': player_key, 'pending': True}, {'key': player_key, 'run': (heavy_selection or {}).get('run', 0) + 1}, dash.no_update
 
-                    fig_scatter.add_trace(go.Scatter(x=x, y=y, mode='markers', name=name, showlegend=False, hoverinfo='text', hovertext=name, marker=dict(color=clus_color_list[clus_num_iter])))
+    # Otherwise put selected player(s) into frequency & efficiency graphs
+    if figures is None:
+        df_update = df_freq_eff[df_freq_eff['UniqueID'].isin(player_key)]
+        figures = {'freq': build_freq_fig(df_update).to_dict(), 'eff': build_eff_fig(df_update).to_dict()}
 
-                # Add legend entry
-                fig_scatter.add_trace(go.Scatter(x=[None], y=[None], name=('Cluster' + str(clus_num_iter+1)), mode='markers', marker=dict(color=clus_color_list[clus_num_iter])))
+    return {'key': player_key, **figures}, dash.no_update, cancel_heavy
 
-                # Iterate for next clus
-                clus_num_iter += 1
 
-            # Remove axes
-            #x axis
-            fig_scatter.update_xaxes(visible=False)
-            fig_scatter.update_yaxes(visible=False)
+# Build frequency & efficiency figures for large selections off the request thread ; a new hand-off or a cancel terminates the superseded job
+@app.callback(
+    Output('heavy-figures-store', 'data'),
+    Input('heavy-selection-store', 'data'),
+    background=True,
+    cancel=[Input('heavy-cancel-store', 'data')],
+    interval=500,
+    prevent_initial_call=True,
+    progress=[Output('figures-progress', 'value'), Output('figures-progress', 'max')],
+    running=[(Output('figures-progress', 'style'), {"display": "block", "width": "98%"}, {"display": "none"})])
+def update_heavy_figures(set_progress, heavy_selection):
+    player_key = heavy_selection['key']
+    df_update = df_freq_eff[df_freq_eff['UniqueID'].isin(player_key)]
 
-            # Change Plot & BG Color
-            fig_scatter.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')           # 'aliceblue' is closer to default color
+    freq_fig = build_freq_fig(df_update).to_dict()
+    set_progress(("1", "2"))
+    eff_fig = build_eff_fig(df_update).to_dict()
 
-            # Increase Marker Size
-            fig_scatter.update_traces(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey')))
+    # Memoize so repeat selections are served straight from the request
+    figures = {'freq': freq_fig, 'eff': eff_fig}
+    figure_cache.set(figure_cache_key(player_key), figures, expire=figure_cache_expire)
 
-            # Create new fig as copy of orig
-            new_fig_scatter = fig_scatter
+    return {'key': player_key, **figures}
 
-            # For each player that was selected, highlight them, otherwise use original marker formatting
-            new_fig_scatter.for_each_trace(lambda trace: trace.update(marker=dict(size=15, line=dict(width=5.5,color='#F8EE35'))) if trace.name in updated_player_list else trace.update(marker=dict(size=10, line=dict(width=1, color='DarkSlateGrey'))))
 
-            # Return updated fig
-            return [dcc.Graph(id="player-scatter", figure=new_fig_scatter, config={"displayModeBar": False})]
+# Show whichever figures belong to the current selection ; background results for a superseded selection are ignored
+app.clientside_callback(
+    """
+    function(figures, heavy_figures) {
+        const triggered = dash_clientside.callback_context.triggered.map(t => t.prop_id);
+        const no_update = dash_clientside.no_update;
+
+        if (triggered.includes("heavy-figures-store.data")) {
+            if (!heavy_figures || !figures || JSON.stringify(heavy_figures.key) !== JSON.stringify(figures.key)) {
+                return [no_update, no_update];
+            }
+            return [heavy_figures.freq, heavy_figures.eff];
+        }
+
+        if (!figures || figures.pending) {
+            return [no_update, no_update];
+        }
+        return [figures.freq, figures.eff];
+    }
+    """,
+    [Output('freq-viz', 'figure'), Output('eff-viz', 'figure')],
+    [Input('figures-store', 'data'), Input('heavy-figures-store', 'data')])
+
+
+# ------------- TEAM & CLUSTER PROFILE CALLBACKS ------------- #
+# Filter team/cluster dropdown & update team/cluster graph straight from the precomputed aggregates in a single callback
+# so a season switch costs one round trip, and none of the graph is resent when no team/cluster is selected
+@app.callback(
+    [Output('agg-group-dd', 'options'), Output('agg-container', 'children')],
+    [Input('agg-level-radio', 'value'), Input('agg-group-dd', 'value'), Input('season-dd', 'value')])
+def update_agg_profiles(sel_level, sel_group_val_list, sel_season_val_list):
+    # Get dropdown value on app initialization. It initiates as string so we need to make into list
+    if type(sel_season_val_list) == str or not sel_season_val_list:
+        sel_season_val_list = ['2022-23']
+    else:
+        pass
 
+    triggered = [i['prop_id'] for i in dash.callback_context.triggered]
 
+    # Team/cluster options only change with the level or seasons
+    if 'agg-group-dd.value' in triggered and len(triggered) == 1:
+        updated_group_dd = dash.no_update
     else:
-        # this condition shouldn't ever hit
-        return [dcc.Graph(id="player-scatter", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})]
+        df_filtered = df_agg[(df_agg['Level'] == sel_level) & (df_agg['SEASON'].isin(sel_season_val_list))]
+        updated_group_dd = sorted(df_filtered['GroupLabel'].unique().tolist(), key=lambda x: (len(x), x))
 
+    # If team(s)/cluster(s) are selected, put them into graph
+    if sel_group_val_list:
+        df_update = df_agg[(df_agg['Level'] == sel_level) & (df_agg['GroupLabel'].isin(sel_group_val_list)) & (df_agg['SEASON'].isin(sel_season_val_list))]
+        new_fig_agg = px.bar(df_update, x="AggID", y="Freq%", color="PlayType", labels={'AggID': sel_level.upper()}, hover_data=['Percentile', 'Players'], color_discrete_sequence=px.colors.qualitative.Vivid, text=df_update["Freq%"].apply(lambda x: '{0:1.2f}%'.format(x)))
 
-# ------------- PLAYER FILTER CALLBACKS ------------- #
-# Update Frequency Graph based on selected player
-@app.callback(Output('player-freq-container', 'children'), [Input('season-dd', 'value'), Input('player-dd', 'value')])
-def show_freq_graph(sel_season_val_list, sel_player_val_list):
+        # Change Plot & BG Color
+        new_fig_agg.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')
 
-    # Update current player drop down value based on season value
-    if sel_player_val_list:
-        updated_player_list = []
-        for player in sel_player_val_list:
-            for season in sel_season_val_list:
-                if season in player:
-                    updated_player_list.append(player)
-                    continue
+        return updated_group_dd, [dcc.Graph(id="agg-viz", figure=new_fig_agg, config={"displayModeBar": False})]
+
+    # if nothing is selected, a season switch leaves the (already empty) graph alone
+    elif triggered == ['season-dd.value']:
+        return updated_group_dd, dash.no_update
+
+    # otherwise leave graph empty
     else:
-        updated_player_list = None
+        return updated_group_dd, [dcc.Graph(id="agg-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})]
 
-    # If player(s) is selected, put them into graph
-    if updated_player_list is not None:
-        df_update = df_freq_eff[df_freq_eff['UniqueID'].isin(updated_player_list)]
-        new_fig_freq = px.bar(df_update, x="UniqueID", y="Freq%", color="PlayType", labels={'x': 'PLAYER'}, color_discrete_sequence=px.colors.qualitative.Vivid, text=df_update["Freq%"].apply(lambda x: '{0:1.2f}%'.format(x)))
 
-        # Change Plot & BG Color
-        new_fig_freq.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite')
+# ------------- PLAYER TRAJECTORY CALLBACKS ------------- #
+def get_player_trajectory(player):
+    """
+    Get a player's stints (ordered by season) from the trajectory index in a single lookup ; None if the player is unknown
+    """
+    if player not in trajectory_index:
+        return None
 
-        return [dcc.Graph(id="freq-viz", figure=new_fig_freq, config={"displayModeBar": False})]
+    start, end = trajectory_index[player]
+    return {k: v[start:end] for k, v in traj.items() if k not in ['playtypes', 'players', 'offsets']}
 
-    # if no players are selected, leave graph empty
-    else:
-        return [dcc.Graph(id="freq-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})]
 
+def cluster_label(clus):
+    return clus_label_dict.get(str(clus), '') if clus != -1 else ''
 
-# Update Efficiency Graph based on selected player
-@app.callback(Output('player-eff-container', 'children'),  [Input('season-dd', 'value'), Input('player-dd', 'value')])
-def show_eff_graph(sel_season_val_list, sel_player_val_list):
-    # Update current player drop down value based on season value
-    if sel_player_val_list:
-        updated_player_list = []
-        for player in sel_player_val_list:
-            for season in sel_season_val_list:
-                if season in player:
-                    updated_player_list.append(player)
-                    continue
+
+# Update trajectory graph based on selected player
+@app.callback(Output('traj-container', 'children'), [Input('traj-player-dd', 'value')])
+def show_traj_graph(sel_player):
+    player_traj = get_player_trajectory(sel_player) if sel_player else None
+
+    # If a player is selected, put each play-type frequency across their stints into graph
+    if player_traj is not None:
+        # Same-season stints (mid-season trades) have no known order, so they're marked and all compared against the previous season
+        x = [team + ' - ' + season + ('*' if same else '') + ' (' + cluster_label(clus) + ')' for team, season, same, clus in zip(player_traj['teams'], player_traj['seasons'], player_traj['same_season'], player_traj['clusters'])]
+        clus_change = ['Cluster change since previous season: ' + cluster_label(prev) + ' -> ' + cluster_label(clus) if prev != -1 and prev != clus else '' for prev, clus in zip(player_traj['prev_clusters'], player_traj['clusters'])]
+
+        new_fig_traj = go.Figure(data=[])
+        for i, playtype in enumerate(playtype_words_list):
+            hovertext = [
+                '{0}<br>Freq: {1:1.2f}%'.format(playtype, freq) + ('' if np.isnan(delta) else ' ({0:+1.2f} vs previous season)'.format(delta)) + ('' if np.isnan(pct) else '<br>PPP Percentile: {0:g}'.format(pct)) + ('<br>' + change if change else '')
+                for freq, delta, pct, change in zip(player_traj['freqs'][:, i], player_traj['freq_deltas'][:, i], player_traj['percentiles'][:, i], clus_change)
+            ]
+            new_fig_traj.add_trace(go.Scatter(name=playtype, x=x, y=player_traj['freqs'][:, i], mode='lines+markers', hoverinfo='text', hovertext=hovertext, line=dict(color=px.colors.qualitative.Vivid[i % len(px.colors.qualitative.Vivid)])))
+
+        # Change Plot & BG Color
+        new_fig_traj.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite', yaxis_title="Freq%", xaxis_title="Team - Season (Cluster)")
+
+        return [dcc.Graph(id="traj-viz", figure=new_fig_traj, config={"displayModeBar": False})]
+
+    # if no player is selected, leave graph empty
     else:
-        updated_player_list = None
+        return [dcc.Graph(id="traj-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})]
 
-    # If player(s) is selected, put them into graph
-    if updated_player_list is not None:
-        # Filter df
-        df_update = df_freq_eff[df_freq_eff['UniqueID'].isin(updated_player_list)]
-        sel_uniqid_list = df_update['UniqueID'].unique().tolist()
 
-        # Empty graph
-        new_fig_eff = go.Figure(data=[])
+# ------------- CACHEABLE BASE FIGURE ROUTES ------------- #
+def conditional_json_response(body, etag):
+    """
+    Build JSON response with an ETag, or a 304 Not Modified when the If-None-Match header matches it
+    """
+    # Flask-Compress rewrites the ETag of compressed responses to '<etag>:<algorithm>', so compare without that suffix
+    if_none_match = parse_etags(flask.request.headers.get('If-None-Match'))
+    matched_tag = next((i for i in if_none_match.as_set(include_weak=True) if i.split(':')[0] == etag), None)
 
-        # For each selected player, update the graph with their stats
-        for uid in sel_uniqid_list:
-            player = df_update[df_update['UniqueID'] == uid]['PLAYER'].unique().tolist()[0]
+    if if_none_match.star_tag or matched_tag is not None:
+        response = flask.Response(status=304)
+        response.set_etag(matched_tag or etag)
+    else:
+        response = flask.Response(body, mimetype='application/json')
+        response.set_etag(etag)
 
-            ppp_list = []
-            freq_list = []
-            exlude_playtype_list = []
-            for playtype in playtype_words_list:
-                # Check if any players in selection have a frequency value within the play type. If not, do not include in graph
-                if df_update[(df_update['UniqueID'].isin(sel_uniqid_list)) & (df_update['PlayType'] == playtype)].empty:
-                    exlude_playtype_list.append(playtype)
-                    continue
+    return response
 
-                # Add a try for if there is no value for that play type
-                try:
-                    ppp = df_update[(df_update['UniqueID'] == uid) & (df_update['PlayType'] == playtype)]['Percentile'].values[0]
-                    freq = df_update[(df_update['UniqueID'] == uid) & (df_update['PlayType'] == playtype)]['Freq%'].values[0]
-                except IndexError as e:
-                    ppp = None
-                    freq = 0
 
-                # Add stat to stat list
-                ppp_list.append(ppp)
-                freq_list.append(freq)
+def parse_season_key(seasons):
+    """
+    Sorted tuple of seasons from a comma separated list (e.g., '2022-23,2021-22') ; None if any season is unknown
+    """
+    season_key = tuple(sorted(set(seasons.split(','))))
+    return season_key if set(season_key).issubset(season_dd) else None
+
+
+# Base scatter figures are served at content-hashed URLs so browsers & reverse proxies can cache them indefinitely
+# Seasons are a comma separated list, so multi-season views (e.g., the default '2021-22,2022-23') have a resource too
+@server.route('/figures/scatter/<seasons>.json')
+def scatter_fig_latest(seasons):
+    season_key = parse_season_key(seasons)
+    if season_key is None:
+        flask.abort(404)
+
+    # Point to the current content-hashed resource ; the redirect itself must always be revalidated
+    _, fig_hash = get_base_scatter(season_key)
+    response = flask.redirect(f"/figures/scatter/{','.join(season_key)}/{fig_hash}.json")
+    response.cache_control.no_cache = True
+    return response
+
+
+@server.route('/figures/scatter/<seasons>/<fig_hash>.json')
+def scatter_fig_hashed(seasons, fig_hash):
+    season_key = parse_season_key(seasons)
+    if season_key is None:
+        flask.abort(404)
+
+    # Stale hashes (i.e., the data has since been refreshed) are not served
+    fig_json, current_hash = get_base_scatter(season_key)
+    if fig_hash != current_hash:
+        flask.abort(404)
+
+    response = conditional_json_response(fig_json, current_hash)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+# ------------- PLAYER PROFILE API ------------- #
+# Read-only batch API over the in-memory data so bulk consumers can pull profiles without loading the UI
+# Filter masks are cached ; pages are serialized per request so the cache stays small however clients vary ids, fields & pages
+api_field_list = ['UniqueID', 'PLAYER', 'TEAM', 'SEASON', 'Cluster', 'ClusterLabel', 'PC1', 'PC2', 'Freq%', 'Percentile']
+api_playtype_field_list = ['Freq%', 'Percentile']
+api_default_page_size = 500
+api_max_page_size = 5000
+
+# One row per UniqueID ; frequency & PPP percentile vectors are pivoted by play-type. Missing frequencies are 0, missing percentiles are null
+# Cluster is the raw cluster id ; ClusterLabel is the 'ClusterN' label the UI shows for it
+df_api_base = df_clus[['UniqueID', 'PLAYER', 'TEAM', 'SEASON', 'Cluster', 'PC1', 'PC2']].drop_duplicates('UniqueID').set_index('UniqueID', drop=False)
+df_api_base.insert(5, 'ClusterLabel', df_api_base['Cluster'].astype(str).map(clus_label_dict))
+df_api_playtype = {
+    'Freq%': df_freq_eff.pivot_table(index='UniqueID', columns='PlayType', values='Freq%', aggfunc='first').reindex(index=df_api_base.index, columns=playtype_words_list).fillna(0),
+    'Percentile': df_freq_eff.pivot_table(index='UniqueID', columns='PlayType', values='Percentile', aggfunc='first').reindex(index=df_api_base.index, columns=playtype_words_list),
+}
+
+# Store as python objects with nulls so slices serialize straight to JSON
+df_api_base = df_api_base.astype(object).where(pd.notna(df_api_base), None)
+df_api_playtype = {k: v.astype(object).where(pd.notna(v), None) for k, v in df_api_playtype.items()}
+df_api_cluster_str = df_api_base['Cluster'].astype(str)
+api_id_set = set(df_api_base.index)
+
+# The cluster filter takes either raw ids or UI labels
+api_cluster_label_to_id = {label: clus for clus, label in clus_label_dict.items()}
+
+
+@lru_cache(maxsize=128)
+def filter_profile_mask(seasons, teams, clusters):
+    """
+    Boolean mask over all profiles for season/team/cluster filters ; only the small mask is cached, not serialized pages
+    """
+    mask = pd.Series(True, index=df_api_base.index)
+    if seasons:
+        mask &= df_api_base['SEASON'].isin(seasons)
+    if teams:
+        mask &= df_api_base['TEAM'].isin(teams)
+    if clusters:
+        mask &= df_api_cluster_str.isin(clusters)
+    return mask
 
-            # Rescale bar widths based on frequency
-            scaler = 0.009
-            scaled_freq_list = [i * scaler if i != 0 and i * scaler > 0.005 else 0.005 for i in freq_list]
 
-            # Prep x-axis with exclusions
-            filt_playtype_words_list = [i for i in playtype_words_list if i not in exlude_playtype_list]
+def query_profiles(ids, seasons, teams, clusters, fields, page, page_size, columnar):
+    """
+    Filter, paginate & serialize profiles for a normalized query, returning the JSON body and its content hash
+    """
+    mask = filter_profile_mask(seasons, teams, clusters)
 
-            # Add player data to fig
-            new_fig_eff.add_trace(go.Bar(name=uid, x=filt_playtype_words_list, y=ppp_list, width=scaled_freq_list, text=[str(i) + '%' if i is not None else '' for i in ppp_list],  textposition="outside"))
+    # Batch lookup keeps the requested UniqueID order ; unknown ids are skipped
+    if ids:
+        sel_index = pd.Index([i for i in ids if i in api_id_set])
+        sel_index = sel_index[mask.loc[sel_index].to_numpy()]
+    else:
+        sel_index = df_api_base.index[mask.to_numpy()]
+
+    # Paginate
+    total = len(sel_index)
+    page_index = sel_index[(page - 1) * page_size: page * page_size]
+
+    # Columnar format returns a list per field (play-type fields return a list per play-type) ; otherwise one record per profile
+    if columnar:
+        data = {}
+        for field in fields:
+            if field in api_playtype_field_list:
+                df_pt = df_api_playtype[field].loc[page_index]
+                data[field] = {pt: df_pt[pt].tolist() for pt in playtype_words_list}
+            else:
+                data[field] = df_api_base.loc[page_index, field].tolist()
+    else:
+        base_fields = [i for i in fields if i not in api_playtype_field_list]
+        data = df_api_base.loc[page_index, base_fields].to_dict('records') if base_fields else [{} for _ in page_index]
+        for field in fields:
+            if field in api_playtype_field_list:
+                for record, values in zip(data, df_api_playtype[field].loc[page_index].to_dict('records')):
+                    record[field] = values
 
-            # Change Plot & BG Color
-            new_fig_eff.update_layout(margin=dict(l=0, r=0, b=0, t=0), paper_bgcolor='ghostwhite', plot_bgcolor='ghostwhite', yaxis_title="Points Per Possession Percentile", xaxis_title="Play-Type", legend=dict(yanchor="top", orientation="h", y=1.1, xanchor="left", x=0.01), uniformtext=dict(minsize=12, mode='show'))           # 'aliceblue' is closer to default color
+    body = json.dumps({'total': total, 'page': page, 'page_size': page_size, 'pages': -(-total // page_size), 'format': 'columnar' if columnar else 'records', 'fields': list(fields), 'data': data})
+    return body, hashlib.sha256(body.encode('utf-8')).hexdigest()[:16]
 
-        return [dcc.Graph(id="eff-viz", figure=new_fig_eff, config={"displayModeBar": False})]
 
-    # if no players are selected, leave graph empty
+def api_arg_list(params, name, split=True):
+    """
+    Get list parameter from a JSON body (list, string or integer) or query string (repeated and/or comma separated) ; ValueError for other JSON types
+    """
+    if isinstance(params, dict):
+        values = params.get(name) or []
+        values = [values] if not isinstance(values, list) else values
+        if not all(isinstance(i, (str, int)) and not isinstance(i, bool) for i in values):
+            raise ValueError(name + ' must be a string, an integer or a list of strings/integers')
+        values = [str(i) for i in values]
     else:
-        return [dcc.Graph(id="eff-viz", figure=blank_fig(row_heights[3]), config={"displayModeBar": False})]
+        values = params.getlist(name)
+
+    if split:
+        values = [i.strip() for v in values for i in v.split(',')]
+
+    return [i for i in values if i]
+
+
+def api_error(message):
+    return flask.jsonify({'error': message}), 400
+
+
+@server.route('/api/v1/profiles', methods=['GET', 'POST'])
+def api_profiles():
+    # Large id batches can be sent as a JSON body to avoid URL length limits
+    params = flask.request.get_json(silent=True) if flask.request.method == 'POST' else None
+    params = params if isinstance(params, dict) else flask.request.args
+
+    # Validate request
+    try:
+        ids = tuple(dict.fromkeys(api_arg_list(params, 'ids', split=False)))
+        seasons = tuple(sorted(set(api_arg_list(params, 'season'))))
+        teams = tuple(sorted(set(api_arg_list(params, 'team'))))
+        clusters = tuple(sorted(set(api_cluster_label_to_id.get(i, i) for i in api_arg_list(params, 'cluster'))))
+        fields = tuple(api_arg_list(params, 'fields')) or tuple(api_field_list)
+    except ValueError as e:
+        return api_error(str(e))
+    response_format = str(params.get('format', 'records'))
+
+    invalid_fields = [i for i in fields if i not in api_field_list]
+    if invalid_fields:
+        return api_error('Unknown fields: ' + ', '.join(invalid_fields) + '. Valid fields: ' + ', '.join(api_field_list))
+    if response_format not in ['records', 'columnar']:
+        return api_error("format must be 'records' or 'columnar'")
+    try:
+        page = int(params.get('page', 1))
+        page_size = int(params.get('page_size', api_default_page_size))
+    except (TypeError, ValueError):
+        return api_error('page and page_size must be integers')
+    if page < 1 or not 1 <= page_size <= api_max_page_size:
+        return api_error('page must be >= 1 and page_size must be between 1 and ' + str(api_max_page_size))
+
+    body, body_hash = query_profiles(ids, seasons, teams, clusters, tuple(dict.fromkeys(fields)), page, page_size, response_format == 'columnar')
+
+    response = conditional_json_response(body, body_hash)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
+
+
+@server.route('/api/v1/trajectories/<path:player>')
+def api_trajectory(player):
+    player_traj = get_player_trajectory(player)
+    if player_traj is None:
+        return flask.jsonify({'error': 'Unknown player: ' + player}), 404
+
+    # Stints within a season have no known order: deltas & PrevCluster are against the player's previous season
+    # Play-type vectors as {play-type: value} ; missing values are null
+    def playtype_values(row):
+        return {pt: (None if np.isnan(i) else round(float(i), 2)) for pt, i in zip(playtype_words_list, row)}
+
+    stints = []
+    for i in range(len(player_traj['unique_ids'])):
+        clus, prev = int(player_traj['clusters'][i]), int(player_traj['prev_clusters'][i])
+        stints.append({'UniqueID': str(player_traj['unique_ids'][i]), 'TEAM': str(player_traj['teams'][i]), 'SEASON': str(player_traj['seasons'][i]),
+                       'SameSeasonStints': bool(player_traj['same_season'][i]),
+                       'Cluster': None if clus == -1 else clus, 'ClusterLabel': cluster_label(clus) or None, 'PrevCluster': None if prev == -1 else prev, 'PrevClusterLabel': cluster_label(prev) or None,
+                       'ClusterChanged': prev != -1 and prev != clus,
+                       'Freq%': playtype_values(player_traj['freqs'][i]), 'Percentile': playtype_values(player_traj['percentiles'][i]), 'Freq%Delta': playtype_values(player_traj['freq_deltas'][i])})
+
+    # Serialized with json.dumps (flask.jsonify sorts keys) so play-types keep their order, as in /api/v1/profiles
+    body = json.dumps({'player': player, 'stints': stints})
+
+    response = conditional_json_response(body, hashlib.sha256(body.encode('utf-8')).hexdigest()[:16])
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
+
+
+@server.route('/api/v1/meta')
+def api_meta():
+    return flask.jsonify({'fields': api_field_list, 'playtypes': playtype_words_list, 'seasons': season_dd, 'teams': sorted(df_clus['TEAM'].unique().tolist()),
+                          'clusters': sorted(df_api_cluster_str.unique().tolist()), 'cluster_labels': clus_label_dict, 'max_page_size': api_max_page_size})
 
 
 # ------------- NEEDED TO RUN APP ------------- #